@@ -8,6 +8,12 @@ logging.basicConfig(level=logging.INFO)
 # %%
 import eventextreme.extreme_extract as ee
 import eventextreme.extreme_threshold as et
+import eventextreme.extreme_io as eio
+
+try:
+    import eventextreme.extreme_polars as ep
+except ImportError:
+    ep = None
 
 # %%
 import importlib
@@ -23,12 +29,14 @@ class EventExtreme:
 
     """
 
-    def __init__(self, data, column_name="pc", threshold_std=1.5, independent_dim=None, combine = False):
+    def __init__(self, data, column_name="pc", threshold_std=1.5, independent_dim=None, combine = False, baseline=None, engine="pandas"):
         """
         Parameters
         ----------
         data : pandas.Series
             A pandas DataFrame object with a 'time' column and a column to be used for threshold calculation.
+            Or an eventextreme.extreme_io.BinarySeries (see extreme_io.open_binary), whose groups
+            are processed as slices of the memory-mapped files.
 
         column_name: str
             The name of the column to be used in the threshold calculation.
@@ -36,12 +44,22 @@ class EventExtreme:
         threshold_std: float
             The threshold value. Default is 1.5 standard deviation.
 
-        independent_dim: str
+        independent_dim: str or list of str
             Extremes should be extracted independently for each value of this dimension.
             for example, if the data is 3D with dimensions ['plev','time','pc'], then
             the independent_dim can be 'plev' and the extreme events are extracted independently for each value of 'plev'.
+            A list of columns, e.g. ['plev', 'ens'], extracts the extremes independently for each combination of their values.
+            If None, the first column apart from 'time' and column_name is used (if any).
         combine: bool
             If True, extreme events are combined for those with same sign_start_time and sign_end_time.
+        baseline: int
+            The length in years of a moving baseline centred on each year, from which a non-stationary
+            threshold is calculated for each (year, day-of-year). Default is None, for a single threshold
+            calculated from the whole record.
+        engine: str
+            The backend of the extraction, 'pandas' (default) or 'polars'. The 'polars' engine runs the
+            windowing, threshold, residual, run detection and sign-time matching of all groups
+            as multi-threaded lazy queries, and returns the same events as the 'pandas' engine.
         """
         self.data = data
         self.threshold_std = (
@@ -57,6 +75,18 @@ class EventExtreme:
 
         self.independent_dim = independent_dim
         self.combine = combine
+        self.baseline = baseline
+        self.engine = engine
+
+        if self.engine not in ["pandas", "polars"]:
+            raise ValueError("engine must be 'pandas' or 'polars'.")
+        if self.engine == "polars" and ep is None:
+            raise ImportError("engine='polars' requires the polars package.")
+
+        # memory-mapped binary data, 29th February is removed and the groups are factorized already
+        if isinstance(self.data, eio.BinarySeries):
+            self.examine_binary()
+            return
 
         # Check if the data is a pandas dataframe with time in one of the columns
         if not isinstance(self.data, pd.DataFrame):
@@ -82,12 +112,22 @@ class EventExtreme:
             ~((self.data["time"].dt.month == 2) & (self.data["time"].dt.day == 29))
         ]
 
+        # factorize the independent dimension(s) into a single integer group code
+        self.group_code = None
+        self.group_keys = None
+        if self.independent_dim is not None:
+            self.factorize_independent_dim()
+
     @property
     def extract_positive_extremes(self):
         """
         propoerty function to extract positive extreme events.
         """
-        if self.independent_dim is None:
+        if self.engine == "polars":
+            self.positive_events = self.extract_extremes_polars(extreme_type="pos")
+        elif isinstance(self.data, eio.BinarySeries):
+            self.positive_events = self.extract_extremes_binary(extreme_type="pos")
+        elif self.independent_dim is None:
             self.positive_events = self.extract_extremes_single(extreme_type="pos")
         else:
             self.positive_events = self.extract_extremes_multi(
@@ -102,7 +142,11 @@ class EventExtreme:
         """
         propoerty function to extract negative extreme events.
         """
-        if self.independent_dim is None:
+        if self.engine == "polars":
+            self.negative_events = self.extract_extremes_polars(extreme_type="neg")
+        elif isinstance(self.data, eio.BinarySeries):
+            self.negative_events = self.extract_extremes_binary(extreme_type="neg")
+        elif self.independent_dim is None:
             self.negative_events = self.extract_extremes_single(extreme_type="neg")
         else:
             self.negative_events = self.extract_extremes_multi(
@@ -128,22 +172,26 @@ class EventExtreme:
 
     def examine_independent_dim(self):
         # if there are other dimensions apart from 'time' and 'column_name'
-        if (len(self.data.columns) < 3) and (self.independent_dim is None):
+        other_columns = [
+            col for col in self.data.columns if col not in ["time", self.column_name]
+        ]
+        if (len(other_columns) == 0) and (self.independent_dim is None):
             logging.info(
                 "single time series data detected. No independent dimension is set."
             )
 
-        elif (len(self.data.columns) >= 3) and (self.independent_dim is None):
-            # update the independent_dim with column that is not 'time' and 'column_name'
-            self.independent_dim = [
-                col
-                for col in self.data.columns
-                if col not in ["time", self.column_name]
-            ][0]
+        elif (len(other_columns) > 0) and (self.independent_dim is None):
+            # update the independent_dim with the first column that is not 'time' and 'column_name'
+            self.independent_dim = other_columns[0]
             logging.info(f"Independent dimension is set to '{self.independent_dim}'")
+            if len(other_columns) > 1:
+                logging.warning(
+                    f"More than one independent dimension detected: {other_columns}. Only '{self.independent_dim}' is used, "
+                    f"pass independent_dim={other_columns} to extract the extremes for each combination of their values."
+                )
 
-        elif (len(self.data.columns) >= 3) and (
-            self.independent_dim in self.data.columns
+        elif (len(other_columns) > 0) and all(
+            dim in other_columns for dim in self.independent_dims
         ):
             logging.info(f"Independent dimension is set to '{self.independent_dim}'")
 
@@ -152,6 +200,92 @@ class EventExtreme:
                 "independent dimension is wrongly set. Please check the data"
             )
 
+    def examine_binary(self):
+        """
+        check the column_name and independent_dim against the binary data.
+        """
+        if self.column_name != self.data.column_name:
+            raise ValueError(f"Data must have a '{self.column_name}' column.")
+
+        binary_dims = self.data.independent_dim
+        if isinstance(binary_dims, str):
+            binary_dims = [binary_dims]
+        if self.independent_dim is None:
+            self.independent_dim = self.data.independent_dim
+        elif self.independent_dims != binary_dims:
+            raise ValueError(
+                "independent dimension is wrongly set. Please check the data"
+            )
+        logging.info(f"Independent dimension is set to '{self.independent_dim}'")
+
+        self.group_code = None
+        self.group_keys = self.data.keys if self.independent_dim is not None else None
+
+    @property
+    def independent_dims(self):
+        """
+        the independent dimension(s) as a list of column names.
+        """
+        if self.independent_dim is None:
+            return []
+        if isinstance(self.independent_dim, str):
+            return [self.independent_dim]
+        return list(self.independent_dim)
+
+    def factorize_independent_dim(self):
+        """
+        Factorize the independent dimension(s) into a single integer 'group' code,
+        so that all combinations of their values are handled in one groupby.
+
+        self.group_code: pandas.Series aligned with self.data, the group code of each row.
+        self.group_keys: pandas.DataFrame indexed by 'group', the values of the independent dimension(s) of each group.
+        Rows with missing values of the independent dimension(s) are removed, as groupby does.
+        """
+        missing = self.data[self.independent_dims].isnull().any(axis=1)
+        if missing.any():
+            logging.warning(
+                f"{missing.sum()} rows with missing '{self.independent_dim}' are removed"
+            )
+            self.data = self.data[~missing]
+
+        codes, self.group_keys = et.factorize_groups(self.data, self.independent_dims)
+        self.group_code = pd.Series(codes, index=self.data.index, name="group")
+
+    def grouped_data(self) -> pd.DataFrame:
+        """
+        self.data with the independent dimension(s) replaced by the 'group' code.
+        """
+        if isinstance(self.data, eio.BinarySeries):
+            return self.data.to_frame()
+        if self.independent_dim is None:
+            return self.data[["time", self.column_name]].assign(group=0)
+        return self.data[["time", self.column_name]].assign(group=self.group_code)
+
+    def polars_data(self):
+        """
+        the data for the polars engine as a polars LazyFrame with 'time', column_name and 'group' columns.
+        The memory-mapped binary data is scanned directly, without building a pandas DataFrame.
+        """
+        if isinstance(self.data, eio.BinarySeries):
+            return self.data.to_lazyframe()
+        return ep.to_polars(self.grouped_data())
+
+    def to_group_code(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        replace the independent dimension(s) columns of df by the 'group' code.
+        """
+        dims = self.independent_dims
+        df = df.merge(self.group_keys.reset_index(), on=dims, how="inner")
+        return df[["group"] + [col for col in df.columns if col not in dims + ["group"]]]
+
+    def from_group_code(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        replace the 'group' code column of df by the independent dimension(s) columns.
+        """
+        keys = self.group_keys.loc[df["group"].values].reset_index(drop=True)
+        df = df.drop(columns="group").reset_index(drop=True)
+        return pd.concat([keys, df], axis=1)
+
     def examine_threshold_dim(self, thr_dayofyear):
         if self.independent_dim is None:
             # must contain 'dayofyear' and 'threshold' columns
@@ -165,10 +299,10 @@ class EventExtreme:
             # must contain self.independent_dim, 'dayofyear' and 'threshold' columns
             if not all(
                 col in thr_dayofyear.columns
-                for col in [self.independent_dim, "dayofyear", "threshold"]
+                for col in self.independent_dims + ["dayofyear", "threshold"]
             ):
                 raise ValueError(
-                    "positive threshold must contain 'dayofyear' and 'threshold' columns"
+                    f"positive threshold must contain {self.independent_dims}, 'dayofyear' and 'threshold' columns"
                 )
 
     def calculate_threshold_single(self, extreme_type: int = "pos") -> pd.DataFrame:
@@ -176,6 +310,7 @@ class EventExtreme:
         Calculate the threshold for positive or negative extreme events.
         The threshold is calculated for each day-of-year with a 7-day window.
         This threshold can be replaced by a user-defined threshold (with data-of-year as one of the columns).
+        If self.baseline is set, the threshold is calculated for each (year, day-of-year) from a moving baseline.
 
         Parameters
         ----------
@@ -188,9 +323,21 @@ class EventExtreme:
         thr_dayofyear: pandas.DataFrame
             A pandas DataFrame with self.independent_dim (if appliable), 'time' and 'threshold' columns
         """
+        if self.baseline is not None:
+            thr_dayofyear = self.calculate_moving_threshold(extreme_type=extreme_type)
+            return thr_dayofyear.drop(columns="group")
+
+        if self.engine == "polars":
+            thr_dayofyear = ep.threshold(
+                self.polars_data(),
+                column_name=self.column_name,
+                extreme_type=extreme_type,
+                window=7,
+            )
+            return thr_dayofyear.drop(columns="group")
 
         data_window = et.construct_window(
-            self.data, column_name=self.column_name, window=7
+            self.grouped_data(), column_name=self.column_name, window=7
         )
 
         if extreme_type == "pos":
@@ -205,28 +352,80 @@ class EventExtreme:
 
         return thr_dayofyear
 
+    def calculate_moving_threshold(self, extreme_type="pos") -> pd.DataFrame:
+        """
+        calculate the moving-baseline threshold for each (year, day-of-year) of each group.
+        The memory-mapped binary data is read one group slice at a time.
+
+        Returns
+        -------
+        thr_dayofyear: pandas.DataFrame
+            A pandas DataFrame with 'group', 'year', 'dayofyear' and 'threshold' columns
+        """
+        if isinstance(self.data, eio.BinarySeries):
+            thr_dayofyear = pd.concat(
+                [
+                    et.moving_threshold(
+                        self.data.group_frame(group),
+                        column_name=self.column_name,
+                        extreme_type=extreme_type,
+                        window=7,
+                        baseline=self.baseline,
+                    ).assign(group=group)
+                    for group in range(self.data.n_groups)
+                ],
+                ignore_index=True,
+            )
+            return thr_dayofyear[["group", "year", "dayofyear", "threshold"]]
+
+        thr_dayofyear = self.grouped_data().groupby("group")[
+            ["time", self.column_name]
+        ].apply(
+            et.moving_threshold,
+            column_name=self.column_name,
+            extreme_type=extreme_type,
+            window=7,
+            baseline=self.baseline,
+        )
+        return thr_dayofyear.droplevel(-1).reset_index()
+
     def calculate_threshold_multi(
         self, independent_dim, extreme_type: int = "pos"
     ) -> pd.DataFrame:
         """
         calculate the threshold idividually for each value of independent_dim.
+        All combinations of the independent dimension(s) are handled in one groupby over the 'group' code.
         """
-        data_window = self.data.groupby(independent_dim)[
+        if self.baseline is not None:
+            thr_dayofyear = self.calculate_moving_threshold(extreme_type=extreme_type)
+            return self.from_group_code(thr_dayofyear)
+
+        if self.engine == "polars":
+            thr_dayofyear = ep.threshold(
+                self.polars_data(),
+                column_name=self.column_name,
+                extreme_type=extreme_type,
+                window=7,
+            )
+            return self.from_group_code(thr_dayofyear)
+
+        data_window = self.grouped_data().groupby("group")[
             ["time", self.column_name]
         ].apply(et.construct_window, column_name=self.column_name, window=7)
         data_window = data_window.droplevel(-1).reset_index()
 
         if extreme_type == "pos":
-            thr_dayofyear = data_window.groupby(independent_dim)[
+            thr_dayofyear = data_window.groupby("group")[
                 ["time", self.column_name]
             ].apply(et.threshold, column_name=self.column_name, extreme_type="pos")
 
         elif extreme_type == "neg":
-            thr_dayofyear = data_window.groupby(independent_dim)[
+            thr_dayofyear = data_window.groupby("group")[
                 ["time", self.column_name]
             ].apply(et.threshold, column_name=self.column_name, extreme_type="neg")
 
         thr_dayofyear = thr_dayofyear.droplevel(-1).reset_index()
+        thr_dayofyear = self.from_group_code(thr_dayofyear)
         return thr_dayofyear
 
     def extract_extremes_single(self, extreme_type="pos"):
@@ -276,7 +475,7 @@ class EventExtreme:
 
             # extract positive 'sign' events based on column_name. This is for find sign_start_time and sign_end_time
             pos_sign_events = ee.extract_pos_extremes(
-                self.data, column=self.column_name
+                self.data.copy(), column=self.column_name
             )
 
             # find the corresponding sign-time for pos_extreme event
@@ -305,7 +504,7 @@ class EventExtreme:
 
             # extract negative 'sign' events based on column_name. This is for find sign_start_time and sign_end_time
             neg_sign_events = ee.extract_neg_extremes(
-                self.data, column=self.column_name
+                self.data.copy(), column=self.column_name
             )
 
             # find the corresponding sign-time for neg_extreme event
@@ -316,11 +515,15 @@ class EventExtreme:
     def extract_extremes_multi(self, independent_dim, extreme_type="pos"):
         """
         extract extreme events individually for each value of independent_dim.
+        If independent_dim is a list of columns, all combinations of their values are
+        handled at once through the integer 'group' code, and the returned events keep all the key columns.
         """
         logging.info(
             f"Using groupby('{independent_dim}') to do analysis for individual values of '{self.independent_dim}'"
         )
 
+        data = self.grouped_data()
+
         if extreme_type == "pos":
             # extreme_strat_time and extreme_end_time are calculated after removing the threshold from original data
             if self.pos_thr_dayofyear is None:
@@ -334,17 +537,19 @@ class EventExtreme:
                 self.examine_threshold_dim(self.pos_thr_dayofyear)
 
             data_residual = et.subtract_threshold(
-                self.data, threshold=pos_thr_dayofyear, column_name=self.column_name
+                data,
+                threshold=self.to_group_code(pos_thr_dayofyear),
+                column_name=self.column_name,
             )
 
             # extract positive 'extreme' events based on 'residual' column. see source code for more details
-            pos_extreme_events = data_residual.groupby(self.independent_dim)[
+            pos_extreme_events = data_residual.groupby("group")[
                 ["time", "residual"]
             ].apply(ee.extract_pos_extremes, column="residual")
             pos_extreme_events = pos_extreme_events.droplevel(-1).reset_index()
 
             # extract positive 'sign' events based on column_name. This is for find sign_start_time and sign_end_time
-            pos_sign_events = self.data.groupby(self.independent_dim)[
+            pos_sign_events = data.groupby("group")[
                 ["time", self.column_name]
             ].apply(ee.extract_pos_extremes, column=self.column_name)
 
@@ -354,7 +559,7 @@ class EventExtreme:
             events = ee.find_sign_times(
                 pos_extreme_events,
                 pos_sign_events,
-                independent_dim=self.independent_dim,
+                independent_dim="group",
                 combine=self.combine,
             )
 
@@ -371,17 +576,19 @@ class EventExtreme:
 
             # extreme_strat_time and extreme_end_time are calculated after removing the threshold from original data
             data_residual = et.subtract_threshold(
-                self.data, threshold=neg_thr_dayofyear, column_name=self.column_name
+                data,
+                threshold=self.to_group_code(neg_thr_dayofyear),
+                column_name=self.column_name,
             )
 
             # extract negative 'extreme' events based on 'residual' column. see source code for more details
-            neg_extreme_events = data_residual.groupby(self.independent_dim)[
+            neg_extreme_events = data_residual.groupby("group")[
                 ["time", "residual"]
             ].apply(ee.extract_neg_extremes, column="residual")
             neg_extreme_events = neg_extreme_events.droplevel(-1).reset_index()
 
             # extract negative 'sign' events based on column_name. This is for find sign_start_time and sign_end_time
-            neg_sign_events = self.data.groupby(self.independent_dim)[
+            neg_sign_events = data.groupby("group")[
                 ["time", self.column_name]
             ].apply(ee.extract_neg_extremes, column=self.column_name)
             neg_sign_events = neg_sign_events.droplevel(-1).reset_index()
@@ -390,8 +597,118 @@ class EventExtreme:
             events = ee.find_sign_times(
                 neg_extreme_events,
                 neg_sign_events,
-                independent_dim=self.independent_dim,
+                independent_dim="group",
                 combine=self.combine,
             )
 
+        # replace the 'group' code by the independent dimension(s)
+        events = self.from_group_code(events)
+
+        return events
+
+    def extract_extremes_polars(self, extreme_type="pos"):
+        """
+        extract extreme events with the polars engine, for a single time series or
+        all values of independent_dim at once. The events are the same as extract_extremes_single
+        and extract_extremes_multi.
+        """
+        if extreme_type == "pos":
+            thr_dayofyear = self.pos_thr_dayofyear
+        elif extreme_type == "neg":
+            thr_dayofyear = self.neg_thr_dayofyear
+
+        if thr_dayofyear is None:
+            logging.info(f"{extreme_type} threshold is calculated for each day-of-year")
+            if self.independent_dim is None:
+                thr_dayofyear = self.calculate_threshold_single(extreme_type=extreme_type)
+            else:
+                thr_dayofyear = self.calculate_threshold_multi(
+                    independent_dim=self.independent_dim, extreme_type=extreme_type
+                )
+        else:
+            logging.info(f"{extreme_type} threshold is set by user")
+            self.examine_threshold_dim(thr_dayofyear)
+
+        if self.independent_dim is None:
+            thr_dayofyear = thr_dayofyear.assign(group=0)
+        else:
+            thr_dayofyear = self.to_group_code(thr_dayofyear)
+
+        events = ep.extract_extremes_events(
+            self.polars_data(),
+            thr_dayofyear,
+            column_name=self.column_name,
+            extreme_type=extreme_type,
+            combine=self.combine,
+        )
+
+        if self.independent_dim is None:
+            events = events.drop(columns="group")
+        else:
+            events = self.from_group_code(events)
+
+        return events
+
+    def extract_extremes_binary(self, extreme_type="pos"):
+        """
+        extract extreme events from the memory-mapped binary data, one group slice at a time.
+        The events are the same as extract_extremes_single and extract_extremes_multi.
+        """
+        if extreme_type == "pos":
+            thr_dayofyear = self.pos_thr_dayofyear
+            extract_extremes = ee.extract_pos_extremes
+        elif extreme_type == "neg":
+            thr_dayofyear = self.neg_thr_dayofyear
+            extract_extremes = ee.extract_neg_extremes
+
+        if thr_dayofyear is not None:
+            logging.info(f"{extreme_type} threshold is set by user")
+            self.examine_threshold_dim(thr_dayofyear)
+            if self.independent_dim is None:
+                thr_dayofyear = thr_dayofyear.assign(group=0)
+            else:
+                thr_dayofyear = self.to_group_code(thr_dayofyear)
+
+        events = []
+        for group in range(self.data.n_groups):
+            data = self.data.group_frame(group)
+
+            if thr_dayofyear is not None:
+                thr_group = thr_dayofyear[thr_dayofyear["group"] == group].drop(
+                    columns="group"
+                )
+            elif self.baseline is not None:
+                thr_group = et.moving_threshold(
+                    data,
+                    column_name=self.column_name,
+                    extreme_type=extreme_type,
+                    window=7,
+                    baseline=self.baseline,
+                )
+            else:
+                data_window = et.construct_window(
+                    data, column_name=self.column_name, window=7
+                )
+                thr_group = et.threshold(
+                    data_window, column_name=self.column_name, extreme_type=extreme_type
+                )
+
+            data_residual = et.subtract_threshold(
+                data, threshold=thr_group, column_name=self.column_name
+            )
+            extreme_events = extract_extremes(data_residual, column="residual")
+            sign_events = extract_extremes(data.copy(), column=self.column_name)
+
+            group_events = ee.find_sign_times(
+                extreme_events, sign_events, combine=self.combine
+            )
+            events.append(group_events.assign(group=group))
+
+        events = pd.concat(events, ignore_index=True)
+
+        if self.independent_dim is None:
+            events = events.drop(columns="group")
+        else:
+            events = self.from_group_code(events)
+
         return events
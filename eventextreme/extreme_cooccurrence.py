@@ -0,0 +1,123 @@
+# %%
+import numpy as np
+import pandas as pd
+
+import eventextreme.extreme_threshold as et
+
+
+# %%
+def to_days(times):
+    """
+    convert times to integer day numbers.
+    """
+    return np.asarray(pd.DatetimeIndex(times).values.astype("datetime64[D]")).astype(
+        np.int64
+    )
+
+
+def overlap_join(left_start, left_end, right_start, right_end):
+    """
+    Find all pairs of overlapping intervals between left and right with a sort-and-sweep.
+
+    Both sides are sorted by start. For each left interval the right candidates are the ones
+    starting before its end (searchsorted on the sorted starts) and whose running maximum of the
+    end reaches its start (searchsorted on the running maximum), so only overlapping or
+    nested candidates are visited: O((N + M) log(N + M) + K) for K candidates.
+
+    Parameters:
+    left_start, left_end (np.ndarray): Day numbers of the first and last day of the left intervals.
+    right_start, right_end (np.ndarray): Day numbers of the first and last day of the right intervals.
+
+    Returns:
+    np.ndarray: The positions in left of the overlapping pairs.
+    np.ndarray: The positions in right of the overlapping pairs.
+    """
+    left_order = np.argsort(left_start, kind="stable")
+    right_order = np.argsort(right_start, kind="stable")
+    ls, le = left_start[left_order], left_end[left_order]
+    rs, re = right_start[right_order], right_end[right_order]
+
+    # candidates of each left interval are right[lo:hi]
+    lo = np.searchsorted(np.maximum.accumulate(re), ls, side="left")
+    hi = np.searchsorted(rs, le, side="right")
+    n_candidates = np.clip(hi - lo, 0, None)
+
+    left_pos = np.repeat(np.arange(len(ls)), n_candidates)
+    offsets = np.cumsum(n_candidates) - n_candidates
+    right_pos = (
+        np.arange(n_candidates.sum()) - np.repeat(offsets, n_candidates)
+    ) + np.repeat(lo, n_candidates)
+
+    # nested intervals may let through candidates ending before the start
+    overlap = re[right_pos] >= ls[left_pos]
+    return left_order[left_pos[overlap]], right_order[right_pos[overlap]]
+
+
+# %%
+def cooccurrence(events, independent_dim, reference=None):
+    """
+    Match the events of each pair of groups that overlap in time, e.g. which 250 hPa events
+    have a matching event at 500 hPa and 1000 hPa, with the lead/lag between them.
+
+    Parameters:
+    events (pd.DataFrame): The events from EventExtreme, with independent_dim column(s).
+    independent_dim (str or list): The column(s) identifying independent groups.
+    reference: The value (tuple of values for multiple independent_dim) of the group
+        to be matched against all other groups. Default is None for all pairs of groups.
+
+    Returns:
+    pd.DataFrame: The matched pairs with the independent_dim, 'index', 'extreme_start_time' and
+    'extreme_end_time' columns of both events (suffixed '_left' and '_right'), the 'overlap_days'
+    and the 'onset_lag' in days (positive when the right event starts later).
+    """
+    codes, keys = et.factorize_groups(events, independent_dim)
+    n_groups = len(keys)
+    dims = list(keys.columns)
+
+    start = to_days(events["extreme_start_time"])
+    end = to_days(events["extreme_end_time"])
+
+    # sort once by group, so that the events of each group are a slice
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+
+    if reference is None:
+        group_pairs = [(i, j) for i in range(n_groups) for j in range(i + 1, n_groups)]
+    else:
+        reference = reference if isinstance(reference, tuple) else (reference,)
+        is_reference = (keys == list(reference)).all(axis=1).values
+        if not is_reference.any():
+            raise ValueError(f"reference {reference} is not found in {dims}")
+        i = int(np.flatnonzero(is_reference)[0])
+        group_pairs = [(i, j) for j in range(n_groups) if j != i]
+
+    left, right = [], []
+    for i, j in group_pairs:
+        left_rows = order[bounds[i] : bounds[i + 1]]
+        right_rows = order[bounds[j] : bounds[j + 1]]
+        left_pos, right_pos = overlap_join(
+            start[left_rows], end[left_rows], start[right_rows], end[right_rows]
+        )
+        left.append(left_rows[left_pos])
+        right.append(right_rows[right_pos])
+
+    left = np.concatenate(left) if left else np.array([], dtype=int)
+    right = np.concatenate(right) if right else np.array([], dtype=int)
+
+    columns = dims + ["extreme_start_time", "extreme_end_time"]
+    pairs = pd.concat(
+        [
+            events[columns]
+            .iloc[rows]
+            .reset_index(names="index")
+            .add_suffix(suffix)
+            for rows, suffix in [(left, "_left"), (right, "_right")]
+        ],
+        axis=1,
+    )
+    pairs["overlap_days"] = (
+        np.minimum(end[left], end[right]) - np.maximum(start[left], start[right]) + 1
+    )
+    pairs["onset_lag"] = start[right] - start[left]
+
+    return pairs
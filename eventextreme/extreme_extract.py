@@ -100,6 +100,7 @@ def find_sign_times(extremes, signs, independent_dim=None, combine=False):
     Parameters:
     extremes (pd.DataFrame): The DataFrame containing the extreme events.
     signs (pd.DataFrame): The DataFrame containing the sign events.
+    independent_dim (str): The column identifying independent groups, if applicable.
     combine (bool): If True, combine the events with the same sign_start_time and sign_end_time.
 
     Returns:
@@ -126,7 +127,10 @@ def find_sign_times(extremes, signs, independent_dim=None, combine=False):
             row["sign_end_time"] = sign_i["extreme_end_time"].values[0]
             new_extremes.append(row)
 
-    new_extremes = pd.DataFrame(new_extremes)
+    new_extremes = pd.DataFrame(
+        new_extremes,
+        columns=list(extremes.columns) + ["sign_start_time", "sign_end_time"],
+    )
 
     # convert the columns to datetime
     date_time_columns = [
@@ -141,8 +145,11 @@ def find_sign_times(extremes, signs, independent_dim=None, combine=False):
     if combine:
         # find duplicated rows on 'sign_start_time' and 'sign_end_time', delete first one, and replace the 'start_time' with
         # smallest 'start_time' and 'end_time' with largest 'end_time'
-        # group by 'sign_start_time' and 'sign_end_time'
-        new_extremes = new_extremes.groupby(["sign_start_time", "sign_end_time"])[
+        # group by 'sign_start_time' and 'sign_end_time' (and independent_dim if applicable)
+        sign_keys = ["sign_start_time", "sign_end_time"]
+        if independent_dim is not None:
+            sign_keys = [independent_dim] + sign_keys
+        new_extremes = new_extremes.groupby(sign_keys)[
             new_extremes.columns
         ].apply(
             lambda x: x.assign(
@@ -160,7 +167,7 @@ def find_sign_times(extremes, signs, independent_dim=None, combine=False):
         ).dt.days + 1
 
         new_extremes = new_extremes.drop_duplicates(
-            subset=["sign_start_time", "sign_end_time"], ignore_index=True
+            subset=sign_keys, ignore_index=True
         )
 
     return new_extremes
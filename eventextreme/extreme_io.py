@@ -0,0 +1,240 @@
+# %%
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import eventextreme.extreme_threshold as et
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+# %%
+def write_binary(
+    df: pd.DataFrame,
+    path: str,
+    column_name: str = "pc",
+    independent_dim=None,
+    dtype: str = "float64",
+):
+    """
+    Write (group, time, value) series to a compact binary directory that can be opened with open_binary.
+
+    The directory contains:
+        day.bin     int32 day numbers since 1970-01-01, sorted by time within each group
+        value.bin   float32 or float64 values of column_name
+        offset.bin  int64 offsets of the groups, the rows of group g are offset[g]:offset[g + 1]
+        meta.json   column_name, independent_dim, the values of independent_dim of each group, ...
+
+    29th February is removed, as in EventExtreme. All times must have the same time of day.
+
+    Parameters:
+    df (pd.DataFrame): Input dataframe with columns ['time', column_name] and the independent_dim column(s).
+    path (str): The directory to write to.
+    column_name (str): The name of the value column.
+    independent_dim (str or list): The column(s) identifying independent series. Default is None for a single series.
+    dtype (str): 'float32' or 'float64'. Default is 'float64'.
+    """
+    if dtype not in ["float32", "float64"]:
+        raise ValueError("dtype must be 'float32' or 'float64'.")
+    if independent_dim is None:
+        dims = []
+    elif isinstance(independent_dim, str):
+        dims = [independent_dim]
+    else:
+        dims = list(independent_dim)
+
+    times = pd.to_datetime(df["time"])
+    keep = ~((times.dt.month == 2) & (times.dt.day == 29))
+    df = df[keep]
+    times = times[keep]
+
+    time_of_day = (times - times.dt.normalize()).unique()
+    if len(time_of_day) > 1:
+        raise ValueError("All times must have the same time of day.")
+
+    # sort by group and time
+    codes, _ = et.factorize_groups(df, independent_dim)
+    days = (times.dt.normalize() - pd.Timestamp("1970-01-01")).dt.days.values
+    order = np.lexsort((days, codes))
+    codes = codes[order]
+    n_groups = int(codes.max()) + 1 if len(codes) else 0
+
+    offsets = np.searchsorted(codes, np.arange(n_groups + 1)).astype(np.int64)
+    keys = df[dims].iloc[order[offsets[:-1]]]
+
+    os.makedirs(path, exist_ok=True)
+    days[order].astype(np.int32).tofile(os.path.join(path, "day.bin"))
+    values = df[column_name].values[order].astype(dtype)
+    values.tofile(os.path.join(path, "value.bin"))
+    offsets.tofile(os.path.join(path, "offset.bin"))
+
+    meta = {
+        "column_name": column_name,
+        "independent_dim": independent_dim,
+        "dtype": dtype,
+        "n_rows": len(df),
+        "n_groups": n_groups,
+        "time_unit": np.datetime_data(times.values.dtype)[0],
+        "time_of_day": int(time_of_day[0] / pd.Timedelta(1, "us")) if len(df) else 0,
+        "keys": {dim: keys[dim].tolist() for dim in dims},
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=4)
+
+
+def csv_to_binary(
+    csv_path: str,
+    path: str,
+    column_name: str = "pc",
+    independent_dim=None,
+    dtype: str = "float64",
+):
+    """
+    Convert a csv file with 'time', column_name (and independent_dim) columns, e.g. data/NAO/example_nao.csv,
+    to the binary directory of write_binary. If independent_dim is None, all columns apart from
+    'time' and column_name are used.
+    """
+    df = pd.read_csv(csv_path)
+    if independent_dim is None:
+        other_columns = [
+            col for col in df.columns if col not in ["time", column_name]
+        ]
+        if len(other_columns) == 1:
+            independent_dim = other_columns[0]
+        elif len(other_columns) > 1:
+            independent_dim = other_columns
+    write_binary(
+        df,
+        path,
+        column_name=column_name,
+        independent_dim=independent_dim,
+        dtype=dtype,
+    )
+
+
+# %%
+class BinarySeries:
+    """
+    (group, time, value) series written by write_binary, opened with np.memmap.
+    The series of each group are read as slices of the memory-mapped files without parsing the csv.
+    Only the value column of group_frame is a view on the files, the threshold and extraction
+    steps of EventExtreme copy it.
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path: str
+            The directory written by write_binary or csv_to_binary.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.path = path
+        self.column_name = meta["column_name"]
+        self.independent_dim = meta["independent_dim"]
+        self.n_groups = meta["n_groups"]
+        self.time_unit = meta["time_unit"]
+        self.time_of_day = np.timedelta64(meta["time_of_day"], "us")
+        self.keys = pd.DataFrame(
+            meta["keys"], index=pd.RangeIndex(self.n_groups, name="group")
+        )
+
+        n_rows = meta["n_rows"]
+        self.day = np.memmap(
+            os.path.join(path, "day.bin"), dtype=np.int32, mode="r", shape=(n_rows,)
+        )
+        self.value = np.memmap(
+            os.path.join(path, "value.bin"),
+            dtype=meta["dtype"],
+            mode="r",
+            shape=(n_rows,),
+        )
+        self.offset = np.fromfile(os.path.join(path, "offset.bin"), dtype=np.int64)
+
+    def to_time(self, day):
+        """
+        convert day numbers to datetime64 with the original time of day and unit.
+        """
+        time = day.astype("datetime64[D]") + self.time_of_day
+        return time.astype(f"datetime64[{self.time_unit}]")
+
+    def group_slice(self, group):
+        """
+        the day numbers and values of a group, as views on the memory-mapped files.
+        """
+        rows = slice(self.offset[group], self.offset[group + 1])
+        return self.day[rows], self.value[rows]
+
+    def group_frame(self, group) -> pd.DataFrame:
+        """
+        a dataframe with 'time' and column_name columns for a group.
+        The values are a view on the memory-mapped file, the 'time' column is built from the day numbers.
+        """
+        day, value = self.group_slice(group)
+        return pd.DataFrame(
+            {"time": self.to_time(day), self.column_name: value}, copy=False
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        a dataframe with 'time', column_name and 'group' columns for all groups.
+        All columns are materialized in memory, use group_frame or to_lazyframe for large data.
+        """
+        group = np.repeat(np.arange(self.n_groups), np.diff(self.offset))
+        return pd.DataFrame(
+            {
+                "time": self.to_time(self.day),
+                self.column_name: self.value,
+                "group": group,
+            },
+            copy=False,
+        )
+
+    def to_lazyframe(self):
+        """
+        a polars LazyFrame with 'time', column_name and 'group' columns for all groups, built from
+        the day numbers, values and offsets without a pandas DataFrame in between.
+        The 'group' of each row is looked up from the offsets with a join_asof on the row number.
+        """
+        if pl is None:
+            raise ImportError(
+                "polars is required for to_lazyframe, install it with `pip install eventextreme[polars]`."
+            )
+        time_unit = self.time_unit if self.time_unit in ["ms", "us", "ns"] else "us"
+        time_of_day = int(self.time_of_day / np.timedelta64(1, "us"))
+
+        starts = pl.LazyFrame(
+            {
+                "row": self.offset[:-1].astype(np.uint32),
+                "group": np.arange(self.n_groups, dtype=np.int64),
+            }
+        )
+        return (
+            pl.from_numpy(self.day, schema=["day"])
+            .with_columns(pl.from_numpy(self.value, schema=[self.column_name]))
+            .lazy()
+            .with_row_index("row")
+            .join_asof(starts, on="row", strategy="backward", check_sortedness=False)
+            .select(
+                (
+                    pl.col("day").cast(pl.Date).cast(pl.Datetime(time_unit))
+                    + pl.duration(microseconds=time_of_day)
+                ).alias("time"),
+                self.column_name,
+                "group",
+            )
+        )
+
+
+def open_binary(path) -> BinarySeries:
+    """
+    open the binary directory written by write_binary or csv_to_binary.
+    """
+    return BinarySeries(path)
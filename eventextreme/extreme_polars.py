@@ -0,0 +1,318 @@
+# %%
+import numpy as np
+import pandas as pd
+import polars as pl
+from scipy import ndimage
+
+
+# %%
+def to_polars(df: pd.DataFrame) -> pl.LazyFrame:
+    """
+    convert a pandas DataFrame to a polars LazyFrame column by column (without pyarrow).
+    """
+    return pl.DataFrame({col: df[col].to_numpy() for col in df.columns}).lazy()
+
+
+def to_lazy(df) -> pl.LazyFrame:
+    """
+    a polars LazyFrame of df, which is either a pandas DataFrame or a polars LazyFrame already.
+    """
+    if isinstance(df, pl.LazyFrame):
+        return df
+    return to_polars(df)
+
+
+def to_pandas(df: pl.DataFrame) -> pd.DataFrame:
+    """
+    convert a polars DataFrame to a pandas DataFrame column by column (without pyarrow).
+    """
+    return pd.DataFrame({col: df[col].to_numpy() for col in df.columns})
+
+
+def adjusted_dayofyear(date: pl.Expr) -> pl.Expr:
+    """
+    extreme_threshold.adjusted_dayofyear as a polars expression.
+    """
+    return (
+        date.dt.ordinal_day().cast(pl.Int64)
+        - (date.dt.is_leap_year() & (date.dt.month() > 2)).cast(pl.Int64)
+    )
+
+
+# %%
+def threshold(
+    df: pd.DataFrame,
+    column_name: str = "pc",
+    relative_thr: int = 1.5,
+    extreme_type: str = "pos",
+    window: int = 7,
+) -> pd.DataFrame:
+    """
+    The same as extreme_threshold.threshold(extreme_threshold.construct_window(df)) for each 'group',
+    as one polars query.
+
+    Parameters:
+    df (pd.DataFrame or pl.LazyFrame): Input data with columns ['time', column_name, 'group'], 29th February removed.
+    column_name (str): The name of the column to be used in the threshold calculation.
+    relative_thr (float): The threshold value. Default is 1.5 standard deviation.
+    extreme_type (str): The type of threshold. Default is 'pos'.
+    window (int): The size of the window. Default is 7.
+
+    Returns:
+    pd.DataFrame: A dataframe with columns ['group', 'dayofyear', 'threshold'].
+    """
+    half = (window - 1) // 2
+    offsets = pl.LazyFrame({"offset": np.arange(-half, half + 1)})
+
+    # every value contributes to the window centred window/2 days before to after it,
+    # missing values are dropped so that their windows are incomplete, as in construct_window
+    windowed = (
+        to_lazy(df)
+        .select("group", pl.col("time").dt.date().alias("date"), column_name)
+        .filter(
+            pl.col(column_name).is_not_null() & pl.col(column_name).is_not_nan()
+        )
+        .join(offsets, how="cross")
+        .with_columns(
+            centre=pl.col("date") + pl.duration(days=pl.col("offset")),
+        )
+    )
+
+    # keep the centre days with a complete window, as construct_window does
+    complete = (
+        windowed.group_by("group", "centre")
+        .agg(pl.len())
+        .filter(pl.col("len") == window)
+    )
+    windowed = windowed.join(complete, on=["group", "centre"], how="semi")
+
+    if extreme_type == "pos":
+        sign = 1
+    elif extreme_type == "neg":
+        sign = -1
+
+    abs_thr = (
+        windowed.group_by("group", adjusted_dayofyear(pl.col("centre")).alias("dayofyear"))
+        .agg((sign * relative_thr * pl.col(column_name).std()).alias("threshold"))
+        .sort("group", "dayofyear")
+        .collect()
+    )
+    return to_pandas(abs_thr)
+
+
+# %%
+def subtract_threshold(
+    lf: pl.LazyFrame, threshold: pd.DataFrame, column_name: str = "pc"
+) -> pl.LazyFrame:
+    """
+    Subtract the threshold from the column_name of lf, looked up by 'group', 'dayofyear' (and 'year' if applicable).
+
+    Parameters:
+    lf (pl.LazyFrame): Input frame with columns ['row', 'time', column_name, 'group'].
+    threshold (pd.DataFrame): Input dataframe with columns ['group', 'dayofyear', 'threshold'] (and 'year' if applicable).
+    column_name (str): The name of the column to be used in the threshold calculation.
+
+    Returns:
+    pl.LazyFrame: lf with the threshold subtracted from column_name, named as 'residual'.
+    """
+    keys = [col for col in threshold.columns if col != "threshold"]
+    thr = to_polars(threshold).with_columns(pl.col(keys).cast(pl.Int64))
+
+    lf = lf.with_columns(
+        dayofyear=adjusted_dayofyear(pl.col("time")),
+        year=pl.col("time").dt.year().cast(pl.Int64),
+    )
+    return (
+        lf.join(thr, on=keys, how="left")
+        .sort("row")
+        .with_columns(
+            residual=(pl.col(column_name) - pl.col("threshold")).fill_null(np.nan)
+        )
+        .select("row", "time", "group", "residual")
+    )
+
+
+# %%
+def extract_extremes(
+    lf: pl.LazyFrame, column: str = "residual", extreme_type: str = "pos"
+) -> pl.LazyFrame:
+    """
+    The same as extreme_extract.extract_pos_extremes / extract_neg_extremes for each 'group'.
+
+    The runs are numbered with a cumulative sum of the sign breaks over (group, year),
+    and aggregated with one group_by over (group, year, run).
+
+    Parameters:
+    lf (pl.LazyFrame): Input frame with columns ['row', 'time', column, 'group'], sorted by 'row'.
+    column (str): The column to extract the events from.
+    extreme_type (str): 'pos' for consecutive above zero events, 'neg' for below zero.
+
+    Returns:
+    pl.LazyFrame: The events with 'group', 'extreme_start_time', 'extreme_end_time', 'extreme_duration',
+    'sum', 'mean', 'max' and 'min' columns.
+    """
+    if extreme_type == "pos":
+        sign = 1
+    elif extreme_type == "neg":
+        sign = -1
+
+    value = pl.col(column)
+    # NaN neither breaks nor belongs to an event, as in pandas
+    is_valid = value.is_not_nan()
+
+    events = (
+        lf.with_columns(
+            # remove the single day anomaly data (with one day tolerance) within each group
+            value.map_batches(
+                lambda s: pl.Series(ndimage.median_filter(s.to_numpy(), size=3)),
+                return_dtype=pl.Float64,
+            ).over("group"),
+            year=pl.col("time").dt.year(),
+        )
+        .with_columns(
+            run=((sign * value < 0) & is_valid).cum_sum().over("group", "year")
+        )
+        .filter((sign * value > 0) & is_valid)
+        .group_by("group", "year", "run")
+        .agg(
+            extreme_start_time=pl.col("time").min(),
+            extreme_end_time=pl.col("time").max(),
+            sum=value.sum(),
+            mean=value.mean(),
+            max=value.max(),
+            min=value.min(),
+        )
+        .with_columns(
+            extreme_duration=(
+                pl.col("extreme_end_time") - pl.col("extreme_start_time")
+            ).dt.total_days()
+            + 1
+        )
+        .select(
+            "group",
+            "extreme_start_time",
+            "extreme_end_time",
+            "extreme_duration",
+            "sum",
+            "mean",
+            "max",
+            "min",
+        )
+    )
+    return events
+
+
+# %%
+def find_sign_times(
+    extremes: pl.LazyFrame, signs: pl.LazyFrame, combine: bool = False
+) -> pl.LazyFrame:
+    """
+    The same as extreme_extract.find_sign_times for each 'group', with a join_asof of the extreme events
+    on the last sign event starting before them.
+
+    Parameters:
+    extremes (pl.LazyFrame): The extreme events.
+    signs (pl.LazyFrame): The sign events.
+    combine (bool): If True, combine the events with the same sign_start_time and sign_end_time.
+
+    Returns:
+    pl.LazyFrame: The extreme events with sign_start_time and sign_end_time.
+    """
+    signs = signs.select(
+        "group",
+        sign_start_time=pl.col("extreme_start_time"),
+        sign_end_time=pl.col("extreme_end_time"),
+    ).sort("sign_start_time")
+
+    events = (
+        extremes.sort("extreme_start_time")
+        .join_asof(
+            signs,
+            left_on="extreme_start_time",
+            right_on="sign_start_time",
+            by="group",
+            strategy="backward",
+            check_sortedness=False,
+        )
+        .filter(pl.col("sign_end_time") >= pl.col("extreme_end_time"))
+        .sort("group", "extreme_start_time")
+    )
+
+    if combine:
+        sign_keys = ["group", "sign_start_time", "sign_end_time"]
+        events = (
+            events.group_by(sign_keys, maintain_order=True)
+            .agg(
+                pl.col("extreme_start_time").min(),
+                pl.col("extreme_end_time").max(),
+                pl.col("sum", "mean", "max", "min").first(),
+            )
+            .sort(sign_keys)
+            .with_columns(
+                extreme_duration=(
+                    pl.col("extreme_end_time") - pl.col("extreme_start_time")
+                ).dt.total_days()
+                + 1,
+                sign_duration=(
+                    pl.col("sign_end_time") - pl.col("sign_start_time")
+                ).dt.total_days()
+                + 1,
+            )
+            .select(
+                "group",
+                "extreme_start_time",
+                "extreme_end_time",
+                "extreme_duration",
+                "sum",
+                "mean",
+                "max",
+                "min",
+                "sign_start_time",
+                "sign_end_time",
+                "sign_duration",
+            )
+        )
+
+    return events
+
+
+# %%
+def extract_extremes_events(
+    df: pd.DataFrame,
+    threshold: pd.DataFrame,
+    column_name: str = "pc",
+    extreme_type: str = "pos",
+    combine: bool = False,
+) -> pd.DataFrame:
+    """
+    The polars engine of EventExtreme: residual, extreme events, sign events and sign-time matching
+    for all groups in one lazy query.
+
+    Parameters:
+    df (pd.DataFrame or pl.LazyFrame): Input data with columns ['time', column_name, 'group'], 29th February removed.
+    threshold (pd.DataFrame): The threshold with columns ['group', 'dayofyear', 'threshold'] (and 'year' if applicable).
+    column_name (str): The name of the column to extract the extremes from.
+    extreme_type (str): 'pos' for positive extreme events, 'neg' for negative extreme events.
+    combine (bool): If True, combine the events with the same sign_start_time and sign_end_time.
+
+    Returns:
+    pd.DataFrame: The events, with the same columns as the pandas engine and 'group'.
+    """
+    lf = (
+        to_lazy(df)
+        .select(
+            "time",
+            pl.col(column_name).cast(pl.Float64),
+            pl.col("group").cast(pl.Int64),
+        )
+        .with_row_index("row")
+    )
+
+    residual = subtract_threshold(lf, threshold, column_name=column_name)
+    extreme_events = extract_extremes(
+        residual, column="residual", extreme_type=extreme_type
+    )
+    sign_events = extract_extremes(lf, column=column_name, extreme_type=extreme_type)
+
+    events = find_sign_times(extreme_events, sign_events, combine=combine).collect()
+    return to_pandas(events)
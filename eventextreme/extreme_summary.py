@@ -0,0 +1,215 @@
+# %%
+import numpy as np
+import pandas as pd
+
+import eventextreme.extreme_threshold as et
+
+
+# %%
+def attach_group_keys(keys, codes, df):
+    """
+    prepend the independent dimension(s) of each group to df.
+    """
+    group_keys = keys.loc[codes].reset_index(drop=True)
+    return pd.concat([group_keys, df.reset_index(drop=True)], axis=1)
+
+
+# %%
+def event_counts(events, independent_dim=None, by="year", years=None, december="next"):
+    """
+    Count the events of each group in each year (or each season of each year), by the extreme_start_time.
+    Years without any event are included with zero count.
+
+    For by='season', december sets the year of the DJF that December belongs to:
+    'next' (default) counts December in the DJF of the following year, i.e. the winter is labelled
+    by the year of its January and February. A DJF row for the year after the last year holds the
+    December of the last year, and the DJF of the first year only has its January and February.
+    'same' counts December in the DJF of its calendar year, so that the seasons of a year add up
+    to the count of by='year'.
+
+    Parameters:
+    events (pd.DataFrame): The events from EventExtreme.
+    independent_dim (str or list): The column(s) identifying independent groups.
+    by (str): 'year' or 'season' (DJF, MAM, JJA, SON). Default is 'year'.
+    years (array-like): The consecutive calendar years of the record. Default is the calendar years spanned
+        by the events, which must be given if there are no events.
+    december (str): 'next' or 'same', the DJF year of December for by='season'. Default is 'next'.
+
+    Returns:
+    pd.DataFrame: A dataframe with independent_dim (if applicable), 'year' ('season') and 'count' columns.
+    """
+    codes, keys = et.factorize_groups(events, independent_dim)
+    n_groups = len(keys)
+
+    start = pd.DatetimeIndex(events["extreme_start_time"])
+    event_years = start.year.values
+
+    if years is None:
+        if len(events) == 0:
+            raise ValueError("years must be given when there are no events.")
+        years = np.arange(event_years.min(), event_years.max() + 1)
+    years = np.asarray(years)
+    year_idx = event_years - years[0]
+    if ((year_idx < 0) | (year_idx >= len(years))).any():
+        raise ValueError(
+            f"events out of the years {years[0]}-{years[-1]}, please check the years."
+        )
+
+    if by == "year":
+        n_bins = 1
+        bin_idx = np.zeros(len(events), dtype=int)
+        bin_labels = None
+        extended = False
+    elif by == "season":
+        if december not in ["next", "same"]:
+            raise ValueError("december must be 'next' or 'same'")
+        n_bins = 4
+        bin_idx = (start.month.values % 12) // 3
+        bin_labels = np.array(["DJF", "MAM", "JJA", "SON"])
+        # December belongs to the winter of the following year, one more year for the last December
+        extended = december == "next"
+        if extended:
+            year_idx = year_idx + (start.month.values == 12)
+    else:
+        raise ValueError("by must be 'year' or 'season'")
+
+    if extended:
+        years = np.append(years, years[-1] + 1)
+    n_years = len(years)
+
+    flat = (codes * n_years + year_idx) * n_bins + bin_idx
+    counts = np.bincount(flat, minlength=n_groups * n_years * n_bins)
+
+    summary = pd.DataFrame({"year": np.tile(np.repeat(years, n_bins), n_groups)})
+    if bin_labels is not None:
+        summary["season"] = np.tile(bin_labels, n_groups * n_years)
+    summary["count"] = counts
+    group_codes = np.repeat(np.arange(n_groups), n_years * n_bins)
+
+    if extended:
+        # the year after the last year only has the DJF of the last December
+        keep = ((summary["year"] != years[-1]) | (summary["season"] == "DJF")).values
+        summary = summary[keep]
+        group_codes = group_codes[keep]
+
+    return attach_group_keys(keys, group_codes, summary)
+
+
+# %%
+def duration_summary(events, independent_dim=None):
+    """
+    The number of events, mean duration and total days in the extreme state of each group.
+
+    Parameters:
+    events (pd.DataFrame): The events from EventExtreme.
+    independent_dim (str or list): The column(s) identifying independent groups.
+
+    Returns:
+    pd.DataFrame: A dataframe with independent_dim (if applicable), 'n_events', 'mean_duration' and 'total_days' columns.
+    """
+    codes, keys = et.factorize_groups(events, independent_dim)
+    n_groups = len(keys)
+    duration = events["extreme_duration"].values.astype(float)
+
+    n_events = np.bincount(codes, minlength=n_groups)
+    total_days = np.bincount(codes, weights=duration, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_duration = total_days / n_events
+
+    summary = pd.DataFrame(
+        {
+            "n_events": n_events,
+            "mean_duration": mean_duration,
+            "total_days": total_days.astype(int),
+        }
+    )
+    return attach_group_keys(keys, np.arange(n_groups), summary)
+
+
+# %%
+def intensity_histogram(events, independent_dim=None, column="mean", bins=10):
+    """
+    The distribution of the intensity of the events of each group, with bins shared by all groups.
+
+    Parameters:
+    events (pd.DataFrame): The events from EventExtreme.
+    independent_dim (str or list): The column(s) identifying independent groups.
+    column (str): The intensity column, one of 'sum', 'mean', 'max', 'min'. Default is 'mean'.
+    bins (int or array-like): The number of bins or the bin edges, as in np.histogram. Default is 10.
+
+    Returns:
+    pd.DataFrame: A dataframe with independent_dim (if applicable), 'bin_left', 'bin_right' and 'count' columns.
+    """
+    codes, keys = et.factorize_groups(events, independent_dim)
+    n_groups = len(keys)
+    values = events[column].values.astype(float)
+
+    edges = np.histogram_bin_edges(values, bins=bins)
+    n_bins = len(edges) - 1
+    # the last bin is closed on the right, as in np.histogram
+    bin_idx = np.searchsorted(edges, values, side="right") - 1
+    bin_idx = np.clip(bin_idx, 0, n_bins - 1)
+    inside = (values >= edges[0]) & (values <= edges[-1])
+
+    counts = np.bincount(
+        codes[inside] * n_bins + bin_idx[inside], minlength=n_groups * n_bins
+    )
+
+    summary = pd.DataFrame(
+        {
+            "bin_left": np.tile(edges[:-1], n_groups),
+            "bin_right": np.tile(edges[1:], n_groups),
+            "count": counts,
+        }
+    )
+    return attach_group_keys(keys, np.repeat(np.arange(n_groups), n_bins), summary)
+
+
+# %%
+def dayofyear_occupancy(events, independent_dim=None, n_years=None):
+    """
+    The fraction of years in an extreme event on each day-of-year for each group.
+
+    Events are not expanded to daily rows, the occupancy is accumulated from the start and end
+    day-of-year of the events with a difference array (+1 at the start, -1 after the end).
+
+    Parameters:
+    events (pd.DataFrame): The events from EventExtreme.
+    independent_dim (str or list): The column(s) identifying independent groups.
+    n_years (int): The number of years of the record. Default is the number of years spanned by the
+        start time of the events, which is only an approximation: years without events at either end
+        of the record are missed and the occupancy is overestimated. Pass the record length where known.
+
+    Returns:
+    pd.DataFrame: A dataframe with independent_dim (if applicable), 'dayofyear' and 'occupancy' columns.
+    """
+    codes, keys = et.factorize_groups(events, independent_dim)
+    n_groups = len(keys)
+
+    start_time = pd.DatetimeIndex(events["extreme_start_time"])
+    start = et.adjusted_dayofyear(start_time) - 1
+    end = et.adjusted_dayofyear(events["extreme_end_time"])  # exclusive
+    if n_years is None:
+        if len(events) == 0:
+            raise ValueError("n_years must be given when there are no events.")
+        n_years = start_time.year.max() - start_time.year.min() + 1
+
+    # events crossing the end of the year are split into [start, 365) and [0, end)
+    wrap = end <= start
+    size = n_groups * 366
+    diff = (
+        np.bincount(codes * 366 + start, minlength=size)
+        - np.bincount(codes * 366 + np.where(wrap, 365, end), minlength=size)
+        + np.bincount(codes[wrap] * 366, minlength=size)
+        - np.bincount(codes[wrap] * 366 + end[wrap], minlength=size)
+    ).reshape(n_groups, 366)
+
+    occupancy = np.cumsum(diff, axis=1)[:, :365] / n_years
+
+    summary = pd.DataFrame(
+        {
+            "dayofyear": np.tile(np.arange(1, 366), n_groups),
+            "occupancy": occupancy.ravel(),
+        }
+    )
+    return attach_group_keys(keys, np.repeat(np.arange(n_groups), 365), summary)
@@ -1,7 +1,59 @@
 # %%
+import numpy as np
 import pandas as pd
 
 
+# %%
+def adjusted_dayofyear(times) -> np.ndarray:
+    """
+    Day-of-year in 1-365, the same for the normal year and leap year:
+    dates from March 1st onward in leap years are shifted back by one day (29th February is removed).
+
+    Parameters:
+    times (array-like): The times.
+
+    Returns:
+    np.ndarray: The adjusted day-of-year of each time.
+    """
+    times = pd.DatetimeIndex(times)
+    return np.asarray(
+        times.dayofyear - times.is_leap_year * (times.month > 2).astype(int)
+    )
+
+
+def factorize_groups(df: pd.DataFrame, independent_dim=None):
+    """
+    Factorize the independent dimension(s) into a single integer group code, in the sorted order of their values.
+    Rows with missing values of the independent dimension(s) must be removed beforehand.
+
+    Parameters:
+    df (pd.DataFrame): Input dataframe with the independent_dim column(s).
+    independent_dim (str or list): The column(s) identifying independent groups. Default is None for a single time series.
+
+    Returns:
+    np.ndarray: The group code of each row.
+    pd.DataFrame: The values of the independent dimension(s) of each group, indexed by 'group'.
+    """
+    if independent_dim is None:
+        return np.zeros(len(df), dtype=int), pd.DataFrame(
+            index=pd.RangeIndex(1, name="group")
+        )
+
+    if isinstance(independent_dim, str):
+        dims = [independent_dim]
+    else:
+        dims = list(independent_dim)
+    codes = df.groupby(dims, sort=True).ngroup().values
+    keys = (
+        df[dims]
+        .assign(group=codes)
+        .drop_duplicates(subset="group")
+        .set_index("group")
+        .sort_index()
+    )
+    return codes, keys
+
+
 # %%
 def threshold(
     df: pd.DataFrame,
@@ -22,18 +74,7 @@ def threshold(
     """
 
     # make the dayofyear the same for both the normal year and leap year
-    times = pd.to_datetime(df.time.values)
-
-    # Identify leap years
-    is_leap_year = times.is_leap_year
-
-    # Adjust dayofyear for dates from March 1st onward in leap years
-    adjusted_dayofyear = times.dayofyear - is_leap_year * (
-        (times.month > 2).astype(int)
-    )
-
-    # Now, incorporate this adjustment back into your xarray object
-    df["adjusted_dayofyear"] = adjusted_dayofyear
+    df["adjusted_dayofyear"] = adjusted_dayofyear(df.time.values)
 
     # groupby dayofyear
     G = df.groupby("adjusted_dayofyear")
@@ -88,15 +129,115 @@ def construct_window(
 # %%
 
 
+def moving_threshold(
+    df: pd.DataFrame,
+    column_name: str = "pc",
+    relative_thr: int = 1.5,
+    extreme_type: str = "pos",
+    window: int = 7,
+    baseline: int = 30,
+) -> pd.DataFrame:
+    """
+    Calculate a non-stationary threshold from a moving baseline of `baseline` years centred on each year.
+
+    The threshold of each (year, day-of-year) is the same as `threshold(construct_window(df))` applied to the
+    years of its baseline only. Instead of constructing the window for every baseline, the window sums
+    and sums of squares are computed once per (year, day-of-year) and every baseline is obtained
+    from cumulative sums along the year axis. The baseline is shifted to stay within the record at its ends.
+
+    Parameters:
+    df (pd.DataFrame): Input dataframe with columns ['time', column_name], 29th February removed.
+    column_name (str): The name of the column to be used in the threshold calculation.
+    relative_thr (float): The threshold value. Default is 1.5 standard deviation.
+    extreme_type (str): The type of threshold. Default is 'pos'.
+    window (int): The size of the day-of-year window. Default is 7.
+    baseline (int): The length of the moving baseline in years. Default is 30.
+
+    Returns:
+    pd.DataFrame: A dataframe with columns ['year', 'dayofyear', 'threshold'].
+    """
+    times = pd.to_datetime(df["time"].values)
+    values = df[column_name].values.astype(float)
+
+    # put the data on a continuous daily grid, missing days (including 29th February) are NaN
+    days = (times.normalize() - pd.Timestamp("1970-01-01")).days.values
+    first_day = days.min()
+    grid = np.full(days.max() - first_day + 1, np.nan)
+    grid[days - first_day] = values
+
+    # window count, sum and sum of squares for each day from cumulative sums along the time axis
+    valid = ~np.isnan(grid)
+    grid_zero = np.where(valid, grid, 0.0)
+    half = (window - 1) // 2
+    csum = [
+        np.concatenate([[0], np.cumsum(a)])
+        for a in (valid.astype(float), grid_zero, grid_zero**2)
+    ]
+    centre = np.arange(half, len(grid) - half)
+    win_n, win_s1, win_s2 = [c[centre + half + 1] - c[centre - half] for c in csum]
+
+    # keep the days with a complete window, as construct_window does
+    complete = win_n == window
+    centre = centre[complete]
+    win_n, win_s1, win_s2 = win_n[complete], win_s1[complete], win_s2[complete]
+
+    # accumulate to (year, day-of-year)
+    centre_times = pd.Timestamp("1970-01-01") + pd.to_timedelta(
+        centre + first_day, unit="D"
+    )
+    dayofyear = adjusted_dayofyear(centre_times)
+    years = np.arange(times.year.min(), times.year.max() + 1)
+    year_idx = centre_times.year.values - years[0]
+    flat = year_idx * 365 + dayofyear - 1
+    n_years = len(years)
+    N, S1, S2 = [
+        np.bincount(flat, weights=w, minlength=n_years * 365).reshape(n_years, 365)
+        for w in (win_n, win_s1, win_s2)
+    ]
+
+    # baseline of each year as [lo, hi) along the year axis, shifted to stay within the record
+    baseline = min(baseline, n_years)
+    lo = np.clip(np.arange(n_years) - baseline // 2, 0, n_years - baseline)
+    hi = lo + baseline
+
+    # statistics of each baseline from cumulative sums along the year axis
+    N, S1, S2 = [
+        np.concatenate([np.zeros((1, 365)), np.cumsum(a, axis=0)]) for a in (N, S1, S2)
+    ]
+    N, S1, S2 = [a[hi] - a[lo] for a in (N, S1, S2)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(np.clip(S2 - S1**2 / N, 0, None) / (N - 1))
+
+    if extreme_type == "pos":
+        abs_thr = relative_thr * std
+    elif extreme_type == "neg":
+        abs_thr = -relative_thr * std
+
+    abs_thr = pd.DataFrame(
+        {
+            "year": np.repeat(years, 365),
+            "dayofyear": np.tile(np.arange(1, 366), n_years),
+            "threshold": abs_thr.ravel(),
+        }
+    )
+    abs_thr = abs_thr[N.ravel() > 1].reset_index(drop=True)
+
+    return abs_thr
+
+
+# %%
+
+
 def subtract_threshold(
     df: pd.DataFrame, threshold: pd.DataFrame, column_name: str = "pc"
 ) -> pd.DataFrame:
     """
     Subtract the threshold from the column_name for each day-of-year in df.
+    If the threshold has a 'year' column (see moving_threshold), it is looked up by year and day-of-year.
 
     Parameters:
     df (pd.DataFrame): Input dataframe with columns ['time', column_name].
-    threshold (pd.DataFrame): Input dataframe with columns ['dayofyear', 'threshold'].
+    threshold (pd.DataFrame): Input dataframe with columns ['dayofyear', 'threshold'] (and 'year' if applicable).
     column_name (str): The name of the column to be used in the threshold calculation.
 
     Returns:
@@ -104,32 +245,29 @@ def subtract_threshold(
     """
     # Make the dayofyear the same for both the normal year and leap year
     times = pd.to_datetime(df["time"].values)
-
-    # Identify leap years
-    is_leap_year = times.is_leap_year
-
-    # Adjust dayofyear for dates from March 1st onward in leap years
-    adjusted_dayofyear = times.dayofyear - is_leap_year * (
-        (times.month > 2).astype(int)
-    )
-
-    # Add adjusted_dayofyear to the dataframe
-    df["adjusted_dayofyear"] = adjusted_dayofyear
+    df = df.assign(adjusted_dayofyear=adjusted_dayofyear(times))
 
     # Ensure the threshold dataframe has a 'dayofyear' column
     if "dayofyear" not in threshold.columns:
         raise ValueError("The threshold dataframe must have a 'dayofyear' column.")
 
-    # Merge the threshold with the df on 'adjusted_dayofyear' and any other columns apart from column_name
-    left_on = [col for col in df.columns if (col != column_name) & (col != "time")]
+    # the moving threshold is looked up by year as well
+    if "year" in threshold.columns:
+        df = df.assign(year=times.year)
+
+    # Merge the threshold with the df on 'adjusted_dayofyear' and any other columns of the threshold
     right_on = [col for col in threshold.columns if col != "threshold"]
+    left_on = ["adjusted_dayofyear" if col == "dayofyear" else col for col in right_on]
 
     df = pd.merge(df, threshold, left_on=left_on, right_on=right_on, how="left")
 
     # Subtract the threshold from the specified column
     df["residual"] = df[column_name] - df["threshold"]
 
-    # Drop the 'adjusted_dayofyear' and 'dayofyear' columns
-    df = df.drop(columns=["adjusted_dayofyear", "dayofyear"])
+    # Drop the 'adjusted_dayofyear', 'dayofyear' (and 'year') columns
+    drop_columns = ["adjusted_dayofyear", "dayofyear"]
+    if "year" in threshold.columns:
+        drop_columns.append("year")
+    df = df.drop(columns=drop_columns)
 
     return df
@@ -62,3 +62,67 @@ extremes.pos_thr_dayofyear = pos_threshold
 #%%
 positive_events = extremes.extract_positive_extremes
 # %%
+
+#%%
+############# extreme events with multiple independent dimensions ##################
+# every combination of 'plev' and 'ens' is handled in one run
+data_ens = pd.concat([data.assign(ens=1), data.assign(ens=2)])
+extremes = evext.EventExtreme(data_ens, independent_dim=['plev', 'ens'])
+positive_events = extremes.extract_positive_extremes
+# %%
+
+#%%
+############# extreme events with a moving-baseline threshold ##################
+# threshold for each (year, day-of-year) from a 30-year baseline centred on each year
+extremes = evext.EventExtreme(data, independent_dim='plev', baseline=30)
+positive_events = extremes.extract_positive_extremes
+# %%
+
+#%%
+############# climatology of the extreme events ##################
+import eventextreme.extreme_summary as es
+
+extremes = evext.EventExtreme(data, independent_dim='plev')
+positive_events = extremes.extract_positive_extremes
+counts = es.event_counts(positive_events, independent_dim='plev', by='season')
+durations = es.duration_summary(positive_events, independent_dim='plev')
+intensity = es.intensity_histogram(positive_events, independent_dim='plev', column='mean')
+occupancy = es.dayofyear_occupancy(positive_events, independent_dim='plev')
+# %%
+
+#%%
+############# co-occurrence of the extreme events across 'plev' ##################
+import eventextreme.extreme_cooccurrence as ec
+
+# 250 hPa events with a matching event at the other levels, and the onset lag
+matched = ec.cooccurrence(positive_events, independent_dim='plev', reference=25000.0)
+# %%
+
+#%%
+############# polars engine ##################
+# same events as the pandas engine, with multi-threaded lazy queries
+extremes = evext.EventExtreme(data, independent_dim='plev', engine='polars')
+positive_events = extremes.extract_positive_extremes
+
+#%%
+# check the two engines against each other on data with gaps (NaN) and missing 'plev'
+data_gap = data.copy()
+data_gap.loc[np.random.default_rng(0).choice(len(data_gap), 50, replace=False), 'pc'] = np.nan
+data_gap.loc[np.random.default_rng(1).choice(len(data_gap), 6, replace=False), 'plev'] = np.nan
+for combine in [False, True]:
+    events_pandas = evext.EventExtreme(data_gap.copy(), independent_dim='plev', combine=combine).extract_positive_extremes
+    events_polars = evext.EventExtreme(data_gap.copy(), independent_dim='plev', combine=combine, engine='polars').extract_positive_extremes
+    pd.testing.assert_frame_equal(events_pandas.reset_index(drop=True), events_polars.reset_index(drop=True), check_exact=False, rtol=0, atol=1e-12)
+# %%
+
+#%%
+############# memory-mapped binary input ##################
+import eventextreme.extreme_io as eio
+
+# convert the csv once, then open it without parsing for repeated analyses
+eio.csv_to_binary('/work/mh0033/m300883/Event_extremes/data/NAO/example_nao.csv',
+                  '/work/mh0033/m300883/Event_extremes/data/NAO/example_nao_bin')
+binary_data = eio.open_binary('/work/mh0033/m300883/Event_extremes/data/NAO/example_nao_bin')
+extremes = evext.EventExtreme(binary_data)
+positive_events = extremes.extract_positive_extremes
+# %%
@@ -9,6 +9,9 @@ setup(
         "numpy",
         "scipy",
     ],
+    extras_require={
+        "polars": ["polars"],
+    },
     author="Quan Liu",
     author_email="quan.liu@mpimet.mpg.de",
     description="A package for extracting extreme events",